@@ -1,20 +1,53 @@
+import asyncio
 import logging
-import nest_asyncio
+from concurrent.futures import ProcessPoolExecutor
 from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
 from telegram.error import TelegramError
-from config import TELEGRAM_TOKEN
+from config import (
+    TELEGRAM_TOKEN, CONVERSION_WORKERS, BOT_API_URL,
+    WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_SECRET
+)
+from file_converter import warm_worker
 from handlers import start_command, help_command, handle_message, button_callback, handle_document
 from log_config import setup_logging
 
-# Apply nest_asyncio to allow nested event loops
-nest_asyncio.apply()
+def create_executor() -> ProcessPoolExecutor:
+    """Create the process pool for CPU-bound conversions so they don't block the event loop"""
+    # Each worker warms the conversion libraries as it starts
+    return ProcessPoolExecutor(max_workers=CONVERSION_WORKERS, initializer=warm_worker)
+
+async def shutdown_executor(application: Application):
+    """Stop the conversion process pool once the application has shut down"""
+    application.bot_data['executor'].shutdown(cancel_futures=True)
 
 def init_application():
     """Initialize and configure the application"""
     try:
-        # Create application instance
-        application = Application.builder().token(TELEGRAM_TOKEN).build()
+        # Create application instance, processing updates concurrently so
+        # one chat's conversion doesn't stall the others
+        builder = (
+            Application.builder()
+            .token(TELEGRAM_TOKEN)
+            .concurrent_updates(True)
+            .post_shutdown(shutdown_executor)
+        )
+
+        # Talk to a local Bot API server if configured; files are then read
+        # straight from its disk instead of downloaded
+        if BOT_API_URL:
+            builder = (
+                builder.base_url(f"{BOT_API_URL}/bot")
+                .base_file_url(f"{BOT_API_URL}/file/bot")
+                .local_mode(True)
+            )
+
+        application = builder.build()
+
+        # Share the conversion process pool with handlers, along with the
+        # factory they use to replace it if a worker dies or hangs
+        application.bot_data['executor'] = create_executor()
+        application.bot_data['executor_factory'] = create_executor
 
         # Add command handlers
         application.add_handler(CommandHandler("start", start_command))
@@ -34,7 +67,7 @@ def init_application():
         logging.error(f"Failed to initialize application: {str(e)}")
         raise
 
-async def main():
+def main():
     """Main function to run the bot"""
     # Setup logging
     setup_logging()
@@ -48,9 +81,21 @@ async def main():
         application = init_application()
         logger.info("Application initialized successfully")
 
-        # Start the bot
-        logger.info("Starting bot polling...")
-        await application.run_polling(allowed_updates=Update.ALL_TYPES)
+        # Start the bot; run_webhook and run_polling manage the event loop themselves.
+        # A webhook has updates pushed as they arrive instead of waiting on getUpdates.
+        if WEBHOOK_URL:
+            logger.info(f"Starting webhook server on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}...")
+            application.run_webhook(
+                listen=WEBHOOK_LISTEN,
+                port=WEBHOOK_PORT,
+                url_path=TELEGRAM_TOKEN,
+                webhook_url=f"{WEBHOOK_URL}/{TELEGRAM_TOKEN}",
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES
+            )
+        else:
+            logger.info("Starting bot polling...")
+            application.run_polling(allowed_updates=Update.ALL_TYPES)
     except TelegramError as te:
         logger.error(f"Telegram API Error: {str(te)}")
         raise
@@ -59,10 +104,16 @@ async def main():
         raise
 
 if __name__ == "__main__":
-    import asyncio
+    # Use uvloop's faster event loop where available (it doesn't support Windows)
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+
     try:
-        asyncio.run(main())
+        main()
     except KeyboardInterrupt:
         logging.info("Bot stopped by user")
     except Exception as e:
-        logging.error(f"Bot crashed: {str(e)}")
\ No newline at end of file
+        logging.error(f"Bot crashed: {str(e)}")
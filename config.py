@@ -11,3 +11,41 @@ if not TELEGRAM_TOKEN:
 # Logging configuration
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Conversion configuration
+# Conversions allowed to run at once; others wait their turn instead of exhausting memory
+MAX_CONCURRENT_CONVERSIONS = int(os.getenv("MAX_CONCURRENT_CONVERSIONS", "4"))
+# Pool workers; more than MAX_CONCURRENT_CONVERSIONS would never be used
+CONVERSION_WORKERS = int(os.getenv(
+    "CONVERSION_WORKERS", min(os.cpu_count() or 1, MAX_CONCURRENT_CONVERSIONS)
+))
+# Page-level workers per PDF; keep CONVERSION_WORKERS * PDF_PAGE_WORKERS within the core count
+PDF_PAGE_WORKERS = int(os.getenv("PDF_PAGE_WORKERS", max(1, (os.cpu_count() or 1) // CONVERSION_WORKERS)))
+# Seconds a single conversion may run before its worker is killed and the pool replaced
+CONVERSION_TIMEOUT = float(os.getenv("CONVERSION_TIMEOUT", "300"))
+# Word to PDF backend: "fpdf" (plain text, built in) or "libreoffice" (full fidelity, needs soffice)
+WORD_TO_PDF_BACKEND = os.getenv("WORD_TO_PDF_BACKEND", "fpdf").lower()
+
+if WORD_TO_PDF_BACKEND not in ("fpdf", "libreoffice"):
+    raise ValueError(
+        f"Unknown WORD_TO_PDF_BACKEND '{WORD_TO_PDF_BACKEND}'. Expected 'fpdf' or 'libreoffice'."
+    )
+
+# Cache configuration (converted files keyed by input hash, LRU-evicted past the size cap).
+# CACHE_DIR defaults to a "cache" directory inside the converter's temp directory.
+CACHE_DIR = os.getenv("CACHE_DIR", "")
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+# Network configuration
+# Base URL of a local Bot API server (telegram-bot-api --local), e.g. http://localhost:8081.
+# Local mode skips the round trip to api.telegram.org and lifts the 20MB download limit.
+BOT_API_URL = os.getenv("BOT_API_URL", "").rstrip("/")
+MAX_FILE_SIZE = (2000 if BOT_API_URL else 20) * 1024 * 1024
+# Public HTTPS URL Telegram pushes updates to, e.g. https://bot.example.com.
+# Leave unset to fall back to long polling.
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+DOWNLOAD_READ_TIMEOUT = float(os.getenv("DOWNLOAD_READ_TIMEOUT", "60"))
+UPLOAD_WRITE_TIMEOUT = float(os.getenv("UPLOAD_WRITE_TIMEOUT", "60"))
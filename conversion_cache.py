@@ -0,0 +1,100 @@
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+class ConversionCache:
+    """On-disk cache of converted files keyed by the SHA-256 of the input"""
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        try:
+            self.cache_dir.mkdir(mode=0o755, parents=True, exist_ok=True)
+            logger.info(f"Conversion cache directory created/verified at {self.cache_dir}")
+        except Exception as e:
+            logger.error(f"Failed to create cache directory: {str(e)}")
+            raise
+
+    @staticmethod
+    def file_digest(file_path: str) -> str:
+        """Return the SHA-256 hex digest of a file's contents"""
+        with open(file_path, 'rb') as f:
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+
+    def _entry_path(self, digest: str, output_ext: str) -> Path:
+        return self.cache_dir / f"{digest}{output_ext}"
+
+    def get(self, digest: str, output_ext: str) -> Optional[bytes]:
+        """Return the cached output for a digest, or None on a miss"""
+        entry = self._entry_path(digest, output_ext)
+        # Read the contents here so a concurrent eviction can't remove the
+        # entry between the lookup and the read
+        try:
+            data = entry.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            # Touch the entry so eviction treats it as recently used
+            os.utime(entry)
+        except FileNotFoundError:
+            pass
+        logger.info(f"Conversion cache hit: {entry.name}")
+        return data
+
+    def put(self, digest: str, output_ext: str, output_path: str) -> None:
+        """Store a converted file in the cache and evict old entries if over capacity"""
+        entry = self._entry_path(digest, output_ext)
+        try:
+            try:
+                os.link(output_path, entry)
+            except FileExistsError:
+                return
+            except OSError:
+                # Hard links fail across filesystems; fall back to an atomic copy
+                tmp_entry = entry.with_name(f".{entry.name}.{uuid.uuid4().hex}")
+                shutil.copyfile(output_path, tmp_entry)
+                os.replace(tmp_entry, entry)
+            logger.info(f"Stored conversion in cache: {entry.name}")
+            self.evict()
+        except Exception as e:
+            logger.error(f"Error storing {output_path} in cache: {str(e)}")
+
+    def put_bytes(self, digest: str, output_ext: str, data: bytes) -> None:
+        """Store converted file contents in the cache and evict old entries if over capacity"""
+        entry = self._entry_path(digest, output_ext)
+        try:
+            # Write under a temporary name so readers never see a partial entry
+            tmp_entry = entry.with_name(f".{entry.name}.{uuid.uuid4().hex}")
+            with open(tmp_entry, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_entry, entry)
+            logger.info(f"Stored conversion in cache: {entry.name}")
+            self.evict()
+        except Exception as e:
+            logger.error(f"Error storing {entry.name} in cache: {str(e)}")
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits within max_bytes"""
+        entries = []
+        total_size = 0
+        for entry in self.cache_dir.iterdir():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+            total_size += stat.st_size
+
+        entries.sort()
+        for _, size, entry in entries:
+            if total_size <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total_size -= size
+            logger.info(f"Evicted cached conversion: {entry.name}")
@@ -1,106 +1,242 @@
+import contextlib
+import functools
+import io
 import logging
+import mmap
+import multiprocessing.util
 import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import zipfile
 from pathlib import Path
+import pymupdf
 from docx import Document
 from fpdf import FPDF
+from lxml import etree
 from pdf2docx import Converter
 
 logger = logging.getLogger(__name__)
 
+# Working directory for downloads and conversion output
+TEMP_DIR = Path(os.getcwd()) / "temp"
+
+# Version of the conversion output, part of every cache key. Bump it whenever
+# a change alters what the converters produce so stale cached results expire.
+CONVERTER_VERSION = 3
+
+# Upper bound on a single LibreOffice conversion, in seconds
+SOFFICE_TIMEOUT = 120
+
+# File signatures: DOCX is a zip archive, legacy .doc an OLE2 compound file.
+# PDF readers accept the %PDF header anywhere in the first 1024 bytes.
+_ZIP_MAGIC = b"PK\x03\x04"
+_OLE2_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+_PDF_MAGIC = b"%PDF-"
+_SNIFF_SIZE = 1024
+
+def _sniff(file_path: str) -> bytes:
+    """Read the leading bytes of a file to check its format"""
+    with open(file_path, 'rb') as f:
+        return f.read(_SNIFF_SIZE)
+
+# Typographic punctuation Word inserts automatically, mapped to the closest
+# Latin-1 characters the core PDF fonts can render
+_SMART = str.maketrans({
+    '\u2018': "'", '\u2019': "'", '\u201c': '"', '\u201d': '"',
+    '\u2013': '-', '\u2014': '-',
+})
+
+# WordprocessingML and markup compatibility namespaces used in word/document.xml
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_MC_NS = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+
+# Text equivalents of run content other than w:t, matching python-docx's paragraph.text
+_RUN_CONTENT_TEXT = {
+    f"{_W_NS}tab": "\t",
+    f"{_W_NS}ptab": "\t",
+    f"{_W_NS}cr": "\n",
+    f"{_W_NS}noBreakHyphen": "-",
+}
+
+class _MappedFile(mmap.mmap):
+    """Read-only memory map usable as a zipfile source (mmap lacks seekable() before 3.13)"""
+
+    def seekable(self) -> bool:
+        return True
+
+def _paragraph_text(paragraph: etree._Element) -> str:
+    """Return the text of a w:p element the way python-docx's paragraph.text reads it"""
+    parts = []
+    for child in paragraph.iterchildren(f"{_W_NS}r", f"{_W_NS}hyperlink"):
+        runs = child.iterchildren(f"{_W_NS}r") if child.tag == f"{_W_NS}hyperlink" else (child,)
+        for run in runs:
+            for content in run:
+                if content.tag == f"{_W_NS}t":
+                    parts.append(content.text or "")
+                elif content.tag == f"{_W_NS}br":
+                    # Only line breaks become text; page and column breaks don't
+                    if content.get(f"{_W_NS}type", "textWrapping") == "textWrapping":
+                        parts.append("\n")
+                else:
+                    parts.append(_RUN_CONTENT_TEXT.get(content.tag, ""))
+    return "".join(parts)
+
+def _iter_paragraph_texts(word_file_path: str):
+    """Stream paragraph texts from a DOCX without building the whole document tree"""
+    # Map the archive into memory so zip entries are paged in on demand
+    # instead of copied through read() calls
+    with open(word_file_path, 'rb') as f, \
+            _MappedFile(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+            zipfile.ZipFile(mapped) as archive, \
+            archive.open("word/document.xml") as xml:
+        for _, paragraph in etree.iterparse(xml, tag=f"{_W_NS}p"):
+            # Text boxes are stored twice, as DrawingML and as a VML fallback;
+            # read only the first copy
+            if next(paragraph.iterancestors(f"{_MC_NS}Fallback"), None) is None:
+                yield _paragraph_text(paragraph)
+            # Free parsed nodes so memory stays bounded regardless of document size
+            paragraph.clear()
+            while paragraph.getprevious() is not None:
+                del paragraph.getparent()[0]
+
+def _is_simple_pdf(pdf_doc: pymupdf.Document) -> bool:
+    """Check whether a PDF is single-column text with no images or vector graphics"""
+    for page in pdf_doc:
+        if page.get_images() or page.get_drawings():
+            return False
+        middle = page.rect.width / 2
+        # Blocks are (x0, y0, x1, y1, text, block_no, block_type); type 1 is an image
+        for block in page.get_text("blocks"):
+            if block[6] != 0 or block[0] >= middle:
+                return False
+    return True
+
 class FileConverter:
     def __init__(self):
         # Use absolute path for temp directory and ensure it exists with proper permissions
-        self.temp_dir = Path(os.getcwd()) / "temp"
+        self.temp_dir = TEMP_DIR
         try:
             self.temp_dir.mkdir(mode=0o755, parents=True, exist_ok=True)
             logger.info(f"Temporary directory created/verified at {self.temp_dir}")
         except Exception as e:
             logger.error(f"Failed to create temp directory: {str(e)}")
             raise
+        # LibreOffice profile, created on first use and reused by later conversions
+        self.soffice_profile = None
+
+    def word_to_pdf(self, word_file_path: str, backend: str = "fpdf") -> str:
+        """Convert Word document to PDF and save it to the temp directory"""
+        pdf_bytes = self.word_to_pdf_bytes(word_file_path, backend)
+
+        # Save PDF next to the input, inside that request's work directory
+        output_path = str(Path(word_file_path).with_suffix(".pdf"))
+        logger.debug(f"Saving PDF to {output_path}")
+        with open(output_path, 'wb') as f:
+            f.write(pdf_bytes)
+
+        logger.info(f"Successfully converted Word file to PDF: {output_path}")
+        return output_path
 
-    def word_to_pdf(self, word_file_path: str) -> str:
-        """Convert Word document to PDF"""
+    def word_to_pdf_bytes(self, word_file_path: str, backend: str = "fpdf") -> bytes:
+        """Convert Word document to PDF with the fpdf or libreoffice backend, returning the PDF contents"""
         try:
             logger.info(f"Starting Word to PDF conversion for {word_file_path}")
 
-            # Verify file extension
-            file_ext = Path(word_file_path).suffix.lower()
-            if file_ext not in ['.doc', '.docx']:
-                raise ValueError(f"Invalid file extension: {file_ext}. Expected .doc or .docx")
-
             # Verify input file exists and is readable
             if not os.path.exists(word_file_path):
                 raise FileNotFoundError(f"Input file not found: {word_file_path}")
 
+            # Verify the content really is a Word document before parsing it.
+            # Legacy .doc files can only be read by LibreOffice.
+            header = _sniff(word_file_path)
+            if not header.startswith(_ZIP_MAGIC) and not (
+                backend == "libreoffice" and header.startswith(_OLE2_MAGIC)
+            ):
+                raise ValueError("The file is not a valid Word document")
+
             # Log file size
             file_size = os.path.getsize(word_file_path)
             logger.info(f"Input file size: {file_size} bytes")
 
-            # Create PDF with proper configuration
+            if backend == "libreoffice":
+                pdf_bytes = self._libreoffice_to_pdf(word_file_path)
+                logger.info(f"Rendered PDF from {word_file_path} with LibreOffice ({len(pdf_bytes)} bytes)")
+                return pdf_bytes
+
+            # Create PDF with proper configuration. A fresh instance is cheap:
+            # fpdf2 keeps core font metrics in module-level tables, and building
+            # one (~40 us) beats deep-copying a preconfigured prototype (~270 us).
             pdf = FPDF()
             pdf.set_auto_page_break(auto=True, margin=15)
             pdf.add_page()
 
-            # Read Word document
-            logger.debug("Opening Word document...")
-            doc = Document(word_file_path)
-            logger.debug("Word document opened successfully")
-
             # Set font (using a font that's guaranteed to be available)
             pdf.set_font("Helvetica", size=12)
 
-            # Process paragraphs with better text handling
+            # Stream paragraphs from the Word document, skipping empty ones
             logger.debug("Processing paragraphs...")
-            for paragraph in doc.paragraphs:
-                if paragraph.text.strip():  # Skip empty paragraphs
-                    # Handle text encoding more robustly
-                    cleaned_text = "".join(char for char in paragraph.text if ord(char) < 128)
-                    pdf.multi_cell(w=0, h=10, txt=cleaned_text)
+            lines = [text for text in _iter_paragraph_texts(word_file_path) if text.strip()]
+            # Lay out all paragraphs in a single call rather than one per paragraph,
+            # substituting smart punctuation and dropping what Latin-1 can't encode
+            if lines:
+                text = "\n".join(lines).translate(_SMART)
+                pdf.multi_cell(w=0, h=10, text=text.encode('latin-1', 'ignore').decode('latin-1'))
             logger.debug("Paragraphs processed successfully")
 
-            # Save PDF with absolute path
-            output_path = str(self.temp_dir / f"{Path(word_file_path).stem}.pdf")
-            logger.debug(f"Saving PDF to {output_path}")
-            pdf.output(output_path)
-
-            if not os.path.exists(output_path):
-                raise FileNotFoundError(f"Output file not found at {output_path}")
-
-            logger.info(f"Successfully converted Word file to PDF: {output_path}")
-            return output_path
+            # Render the PDF in memory
+            pdf_bytes = bytes(pdf.output())
+            logger.info(f"Rendered PDF from {word_file_path} ({len(pdf_bytes)} bytes)")
+            return pdf_bytes
         except Exception as e:
             logger.error(f"Error converting Word to PDF: {str(e)}", exc_info=True)
             if os.path.exists(word_file_path):
                 logger.error(f"Input file size: {os.path.getsize(word_file_path)} bytes")
             raise
 
-    def pdf_to_word(self, pdf_file_path: str) -> str:
-        """Convert PDF to Word document"""
+    def pdf_to_word(self, pdf_file_path: str, page_workers: int = 1) -> str:
+        """Convert PDF to Word document, parsing pages across page_workers processes"""
         try:
             logger.info(f"Starting PDF to Word conversion for {pdf_file_path}")
 
-            # Verify file extension
-            file_ext = Path(pdf_file_path).suffix.lower()
-            if file_ext != '.pdf':
-                raise ValueError(f"Invalid file extension: {file_ext}. Expected .pdf")
-
             # Verify input file exists and is readable
             if not os.path.exists(pdf_file_path):
                 raise FileNotFoundError(f"Input file not found: {pdf_file_path}")
 
+            # Verify the content really is a PDF before parsing it
+            if _PDF_MAGIC not in _sniff(pdf_file_path):
+                raise ValueError("The file is not a valid PDF")
+
             # Log file size
             file_size = os.path.getsize(pdf_file_path)
             logger.info(f"Input file size: {file_size} bytes")
 
-            # Create output path with absolute path
-            output_path = str(self.temp_dir / f"{Path(pdf_file_path).stem}.docx")
+            # Write the output next to the input, inside that request's work directory
+            output_path = str(Path(pdf_file_path).resolve().with_suffix(".docx"))
             logger.debug(f"Output path set to {output_path}")
 
-            # Convert PDF to Word with proper error handling
+            # Plain text PDFs don't need pdf2docx's layout analysis
+            with pymupdf.open(pdf_file_path) as pdf_doc:
+                if _is_simple_pdf(pdf_doc):
+                    logger.debug("Text-only PDF detected, extracting text directly...")
+                    self._pdf_text_to_word(pdf_doc, output_path)
+                    logger.info(f"Successfully converted PDF to Word: {output_path}")
+                    return output_path
+
+            # Convert PDF to Word with proper error handling. Use an absolute
+            # path since page workers may run from another directory.
             logger.debug("Initializing PDF converter...")
-            cv = Converter(pdf_file_path)
-            logger.debug("Starting conversion process...")
-            cv.convert(output_path, start=0, end=None)
+            cv = Converter(os.path.abspath(pdf_file_path))
+            page_workers = min(page_workers, len(cv.fitz_doc))
+            logger.debug(f"Starting conversion process with {page_workers} page worker(s)...")
+            if page_workers > 1:
+                # pdf2docx dumps parsed pages into the working directory, so give
+                # each conversion its own to keep concurrent conversions apart
+                with tempfile.TemporaryDirectory(dir=self.temp_dir) as work_dir, contextlib.chdir(work_dir):
+                    cv.convert(output_path, start=0, end=None, multi_processing=True, cpu_count=page_workers)
+            else:
+                cv.convert(output_path, start=0, end=None)
             cv.close()
             logger.debug("Conversion completed")
 
@@ -115,11 +251,127 @@ class FileConverter:
                 logger.error(f"Input file size: {os.path.getsize(pdf_file_path)} bytes")
             raise
 
-    def cleanup_temp_files(self, file_path: str):
-        """Remove temporary files"""
+    def _libreoffice_to_pdf(self, word_file_path: str) -> bytes:
+        """Convert a Word document to PDF with headless LibreOffice"""
+        soffice = shutil.which("soffice") or shutil.which("libreoffice")
+        if not soffice:
+            raise RuntimeError("LibreOffice backend selected but soffice was not found on PATH")
+
+        soffice_profile = self._get_soffice_profile()
+
+        with tempfile.TemporaryDirectory(dir=self.temp_dir) as out_dir:
+            logger.debug("Converting with LibreOffice...")
+            # soffice runs the converter as a child process (soffice.bin), so
+            # start it in its own session to be able to kill the whole group
+            process = subprocess.Popen(
+                [
+                    soffice,
+                    f"-env:UserInstallation={soffice_profile.as_uri()}",
+                    "--headless",
+                    "--convert-to", "pdf",
+                    "--outdir", out_dir,
+                    os.path.abspath(word_file_path),
+                ],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                start_new_session=True,
+            )
+            try:
+                _, stderr = process.communicate(timeout=SOFFICE_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+                process.communicate()
+                # The killed instance may leave the profile locked; use a new one next time
+                shutil.rmtree(soffice_profile, ignore_errors=True)
+                self.soffice_profile = None
+                raise
+            output_path = Path(out_dir) / f"{Path(word_file_path).stem}.pdf"
+            if process.returncode != 0 or not output_path.exists():
+                raise RuntimeError(
+                    f"LibreOffice conversion failed (exit code {process.returncode}): "
+                    f"{stderr.decode(errors='replace').strip()}"
+                )
+            return output_path.read_bytes()
+
+    def _get_soffice_profile(self) -> Path:
+        """Return this process's LibreOffice profile directory, creating it on first use"""
+        # A dedicated profile per process keeps concurrent conversions from
+        # contending for the default one and skips re-initializing it each time
+        if self.soffice_profile is None:
+            self.soffice_profile = Path(tempfile.mkdtemp(prefix="soffice-profile-", dir=self.temp_dir))
+            # Remove it when the process exits. Pool workers end with os._exit,
+            # which skips atexit but still runs multiprocessing finalizers.
+            multiprocessing.util.Finalize(
+                self, shutil.rmtree, args=(self.soffice_profile,),
+                kwargs={"ignore_errors": True}, exitpriority=0
+            )
+        return self.soffice_profile
+
+    def _pdf_text_to_word(self, pdf_doc: pymupdf.Document, output_path: str):
+        """Write the text of a PDF to a Word document, one paragraph per text block"""
+        doc = Document()
+        for page in pdf_doc:
+            if page.number > 0:
+                doc.add_page_break()
+            for block in page.get_text("blocks", sort=True):
+                # Lines within a block are wrapped lines of the same paragraph
+                text = " ".join(line.strip() for line in block[4].splitlines())
+                if text.strip():
+                    doc.add_paragraph(text)
+        doc.save(output_path)
+
+    def create_work_dir(self) -> Path:
+        """Create a private directory for one request's download and conversion output"""
+        return Path(tempfile.mkdtemp(dir=self.temp_dir))
+
+    def cleanup_work_dir(self, work_dir: Path):
+        """Remove a request's work directory and everything in it"""
         try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                logger.info(f"Cleaned up temporary file: {file_path}")
+            shutil.rmtree(work_dir)
+            logger.info(f"Cleaned up work directory: {work_dir}")
+        except FileNotFoundError:
+            pass
         except Exception as e:
-            logger.error(f"Error cleaning up file {file_path}: {str(e)}")
\ No newline at end of file
+            logger.error(f"Error cleaning up work directory {work_dir}: {str(e)}")
+
+@functools.lru_cache(maxsize=None)
+def _get_converter() -> FileConverter:
+    """Return the converter shared by all conversions in this process"""
+    return FileConverter()
+
+def word_to_pdf_bytes_worker(word_file_path: str, backend: str = "fpdf") -> bytes:
+    """Process pool entry point for Word to PDF conversion"""
+    return _get_converter().word_to_pdf_bytes(word_file_path, backend)
+
+def pdf_to_word_worker(pdf_file_path: str, page_workers: int = 1) -> str:
+    """Process pool entry point for PDF to Word conversion"""
+    return _get_converter().pdf_to_word(pdf_file_path, page_workers)
+
+def warm_worker() -> None:
+    """Process pool initializer that runs each conversion path once on a tiny PDF"""
+    # The libraries are imported with this module, but their fonts, parsers
+    # and lazily built tables only load on first use. Paying that in the
+    # initializer keeps it off the first real conversion in each worker.
+    try:
+        _get_converter()
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font("Helvetica", size=12)
+        pdf.multi_cell(w=0, h=10, text="warm-up")
+        sample = bytes(pdf.output())
+
+        with pymupdf.open(stream=sample, filetype="pdf") as pdf_doc:
+            _is_simple_pdf(pdf_doc)
+
+        # pdf2docx logs every page at INFO through the root logger
+        logging.disable(logging.INFO)
+        try:
+            cv = Converter(stream=sample)
+            cv.convert(io.BytesIO())
+            cv.close()
+        finally:
+            logging.disable(logging.NOTSET)
+        logger.debug(f"Conversion worker {os.getpid()} warmed up")
+    except Exception as e:
+        # A failing initializer would break the whole pool; run cold instead
+        logger.warning(f"Conversion worker warm-up failed: {str(e)}")
@@ -1,14 +1,85 @@
+import asyncio
 import logging
 import os
+import shutil
+import weakref
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
-from file_converter import FileConverter
+from config import (
+    BOT_API_URL, DOWNLOAD_READ_TIMEOUT, UPLOAD_WRITE_TIMEOUT, PDF_PAGE_WORKERS, WORD_TO_PDF_BACKEND,
+    MAX_CONCURRENT_CONVERSIONS, CONVERSION_TIMEOUT, MAX_FILE_SIZE, CACHE_DIR, CACHE_MAX_BYTES
+)
+from conversion_cache import ConversionCache
+from file_converter import (
+    TEMP_DIR, CONVERTER_VERSION, FileConverter, word_to_pdf_bytes_worker, pdf_to_word_worker
+)
 from utils import send_error_message, log_user_action
 
 logger = logging.getLogger(__name__)
 file_converter = FileConverter()
+conversion_cache = ConversionCache(CACHE_DIR or str(TEMP_DIR / "cache"), CACHE_MAX_BYTES)
+
+# Accepted input extensions per conversion type
+_EXTS = {
+    'word_to_pdf': frozenset({'.doc', '.docx'}),
+    'pdf_to_word': frozenset({'.pdf'}),
+}
+_INVALID_EXT_MESSAGES = {
+    'word_to_pdf': (
+        "❌ For Word to PDF conversion, please send a valid Word document.\n"
+        "Supported formats: .doc or .docx"
+    ),
+    'pdf_to_word': (
+        "❌ For PDF to Word conversion, please send a valid PDF file.\n"
+        "Supported format: .pdf"
+    ),
+}
+
+# Admission control for conversions so concurrent load can't exhaust memory
+_conversion_semaphore = asyncio.Semaphore(MAX_CONCURRENT_CONVERSIONS)
+
+# Per-chat locks keep conversions ordered within a chat while other chats proceed
+_chat_locks = weakref.WeakValueDictionary()
+
+def _get_chat_lock(chat_id: int) -> asyncio.Lock:
+    """Return the conversion lock for a chat, creating it on first use"""
+    lock = _chat_locks.get(chat_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _chat_locks[chat_id] = lock
+    return lock
+
+def _replace_executor(context: ContextTypes.DEFAULT_TYPE, executor, terminate: bool = False):
+    """Swap a broken or hung process pool for a fresh one"""
+    # Concurrent conversions on the same pool fail together; only the first replaces it
+    if context.bot_data['executor'] is not executor:
+        return
+    context.bot_data['executor'] = context.bot_data['executor_factory']()
+    if terminate:
+        # A hung worker never returns, so stop it rather than leave it running
+        for process in list(executor._processes.values()):
+            process.terminate()
+    executor.shutdown(wait=False)
+
+async def _run_conversion(context: ContextTypes.DEFAULT_TYPE, func, *args):
+    """Run a conversion in the process pool, replacing the pool if a worker dies or hangs"""
+    executor = context.bot_data['executor']
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(
+            loop.run_in_executor(executor, func, *args), CONVERSION_TIMEOUT
+        )
+    except BrokenProcessPool:
+        logger.error("A conversion worker died, replacing the process pool")
+        _replace_executor(context, executor)
+        raise
+    except TimeoutError:
+        logger.error(f"Conversion timed out after {CONVERSION_TIMEOUT:g}s, replacing the process pool")
+        _replace_executor(context, executor, terminate=True)
+        raise
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the /start command"""
@@ -102,81 +173,90 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # Validate file extension with more detailed error messages
-    if conversion_type == 'word_to_pdf':
-        if not file_name.lower().endswith(('.doc', '.docx')):
-            await update.message.reply_text(
-                "❌ For Word to PDF conversion, please send a valid Word document.\n"
-                "Supported formats: .doc or .docx"
-            )
-            return
-    elif conversion_type == 'pdf_to_word':
-        if not file_name.lower().endswith('.pdf'):
-            await update.message.reply_text(
-                "❌ For PDF to Word conversion, please send a valid PDF file.\n"
-                "Supported format: .pdf"
-            )
-            return
-
-    # Validate file size (max 20MB)
-    max_size = 20 * 1024 * 1024  # 20MB in bytes
-    if file_size > max_size:
+    if Path(file_name).suffix.lower() not in _EXTS[conversion_type]:
+        await update.message.reply_text(_INVALID_EXT_MESSAGES[conversion_type])
+        return
+
+    # Validate file size (20MB via the cloud Bot API, 2000MB via a local server)
+    if file_size > MAX_FILE_SIZE:
         await update.message.reply_text(
-            "❌ File is too large. Maximum file size is 20MB."
+            f"❌ File is too large. Maximum file size is {MAX_FILE_SIZE // (1024 * 1024)}MB."
         )
         return
 
-    download_path = None
-    output_path = None
+    work_dir = None
 
     try:
-        # Create temp directory if it doesn't exist
-        temp_dir = Path("temp")
-        temp_dir.mkdir(exist_ok=True)
-        logger.info(f"Temp directory status - exists: {temp_dir.exists()}, is_dir: {temp_dir.is_dir()}")
-
-        # Download the file
+        # Download into a directory of this request's own, so concurrent uploads
+        # with the same name never share input or output paths
         file = await context.bot.get_file(update.message.document.file_id)
-        download_path = temp_dir / file_name
+        work_dir = await asyncio.to_thread(file_converter.create_work_dir)
+        download_path = work_dir / Path(file_name).name
         logger.info(f"Downloading file to {download_path}")
-        await file.download_to_drive(str(download_path))
+        if BOT_API_URL:
+            # A local Bot API server hands back a path on its own disk, which
+            # download_to_drive would copy on the event loop thread
+            await asyncio.to_thread(shutil.copyfile, file.file_path, download_path)
+        else:
+            await file.download_to_drive(str(download_path), read_timeout=DOWNLOAD_READ_TIMEOUT)
 
         # Verify downloaded file
         if not os.path.exists(str(download_path)):
             raise FileNotFoundError(f"Downloaded file not found at {download_path}")
 
-        downloaded_size = os.path.getsize(str(download_path))
-        logger.info(f"File downloaded successfully. Size: {downloaded_size} bytes")
+        logger.info("File downloaded successfully")
+
+        # Reuse an earlier conversion of identical content if one is cached
+        output_ext = '.pdf' if conversion_type == 'word_to_pdf' else '.docx'
+        digest = await asyncio.to_thread(conversion_cache.file_digest, str(download_path))
+        # Key on the converter version too, so output from older releases isn't served
+        cache_key = f"{digest}-v{CONVERTER_VERSION}"
+        if conversion_type == 'word_to_pdf' and WORD_TO_PDF_BACKEND != 'fpdf':
+            # Backends render differently, so keep their cached PDFs apart
+            cache_key = f"{cache_key}-{WORD_TO_PDF_BACKEND}"
+        output_data = await asyncio.to_thread(conversion_cache.get, cache_key, output_ext)
+
+        if output_data is None:
+            await update.message.reply_text("⚙️ Converting your file... Please wait.")
+            logger.info("Starting file conversion process...")
+
+            # Convert the file in the process pool, one conversion at a time per chat
+            # and at most MAX_CONCURRENT_CONVERSIONS overall to bound memory use.
+            # PDFs come back in memory so they don't need a write and re-read.
+            async with _get_chat_lock(update.effective_chat.id):
+                if _conversion_semaphore.locked():
+                    logger.info("All conversion slots are busy, waiting for one to free up...")
+                async with _conversion_semaphore:
+                    if conversion_type == 'word_to_pdf':
+                        output_data = await _run_conversion(
+                            context, word_to_pdf_bytes_worker, str(download_path), WORD_TO_PDF_BACKEND
+                        )
+                    else:  # pdf_to_word
+                        output_path = await _run_conversion(
+                            context, pdf_to_word_worker, str(download_path), PDF_PAGE_WORKERS
+                        )
 
-        await update.message.reply_text("⚙️ Converting your file... Please wait.")
-        logger.info("Starting file conversion process...")
+            if conversion_type == 'word_to_pdf':
+                await asyncio.to_thread(conversion_cache.put_bytes, cache_key, output_ext, output_data)
+            else:  # pdf_to_word
+                output_data = await asyncio.to_thread(Path(output_path).read_bytes)
+                await asyncio.to_thread(conversion_cache.put, cache_key, output_ext, output_path)
 
-        # Convert the file
         if conversion_type == 'word_to_pdf':
-            output_path = file_converter.word_to_pdf(str(download_path))
-            output_name = Path(output_path).name
-            output_size = os.path.getsize(output_path)
-            logger.info(f"PDF conversion completed. Output size: {output_size} bytes")
-
-            # Send the converted PDF
-            await context.bot.send_document(
-                chat_id=update.effective_chat.id,
-                document=open(output_path, 'rb'),
-                filename=output_name,
-                caption="✅ Here's your converted PDF file!"
-            )
+            logger.info(f"PDF conversion completed. Output size: {len(output_data)} bytes")
+            caption = "✅ Here's your converted PDF file!"
         else:  # pdf_to_word
-            output_path = file_converter.pdf_to_word(str(download_path))
-            output_name = Path(output_path).name
-            output_size = os.path.getsize(output_path)
-            logger.info(f"Word conversion completed. Output size: {output_size} bytes")
-
-            # Send the converted Word document
-            await context.bot.send_document(
-                chat_id=update.effective_chat.id,
-                document=open(output_path, 'rb'),
-                filename=output_name,
-                caption="✅ Here's your converted Word document!"
-            )
+            logger.info(f"Word conversion completed. Output size: {len(output_data)} bytes")
+            caption = "✅ Here's your converted Word document!"
+
+        # Send the converted document
+        await context.bot.send_document(
+            chat_id=update.effective_chat.id,
+            document=output_data,
+            filename=f"{Path(file_name).stem}{output_ext}",
+            caption=caption,
+            write_timeout=UPLOAD_WRITE_TIMEOUT
+        )
 
     except FileNotFoundError as e:
         logger.error(f"File not found error: {str(e)}")
@@ -189,14 +269,16 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"❌ Error: {str(e)}\n"
             "Please make sure you're sending the correct file type for the selected conversion."
         )
+    except TimeoutError:
+        await update.message.reply_text(
+            "❌ Sorry, converting your file took too long. Please try a smaller or simpler file."
+        )
     except Exception as e:
         logger.error(f"Error processing document: {str(e)}", exc_info=True)
         await update.message.reply_text(
             "❌ Sorry, there was an error processing your file. Please try again."
         )
     finally:
-        # Cleanup temporary files
-        if download_path and os.path.exists(str(download_path)):
-            file_converter.cleanup_temp_files(str(download_path))
-        if output_path and os.path.exists(output_path):
-            file_converter.cleanup_temp_files(output_path)
\ No newline at end of file
+        # Cleanup the download and conversion output
+        if work_dir:
+            await asyncio.to_thread(file_converter.cleanup_work_dir, work_dir)
\ No newline at end of file
@@ -1,23 +1,37 @@
+import atexit
 import logging
+import logging.handlers
+import multiprocessing
 from config import LOG_LEVEL, LOG_FORMAT
 
 def setup_logging():
     """Configure logging for the application"""
     # Convert string log level to logging constant
     numeric_level = getattr(logging, LOG_LEVEL.upper(), logging.INFO)
-    
-    # Configure the root logger
+
+    # Log to console from a background listener thread so formatting and
+    # console I/O stay off the event loop. A multiprocessing queue also
+    # carries records from the forked conversion workers.
+    log_queue = multiprocessing.Queue(-1)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = logging.handlers.QueueListener(log_queue, console_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    # Configure the root logger to only enqueue records, replacing the
+    # handler pdf2docx installs on import
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
     logging.basicConfig(
         level=numeric_level,
-        format=LOG_FORMAT,
-        handlers=[
-            logging.StreamHandler()  # Log to console
-        ]
+        handlers=[queue_handler],
+        force=True
     )
-    
+
     # Set more restrictive logging for some chatty libraries
     logging.getLogger("httpx").setLevel(logging.WARNING)
     logging.getLogger("telegram").setLevel(logging.WARNING)
-    
+
     logger = logging.getLogger(__name__)
     logger.debug("Logging configured successfully")
@@ -1,7 +1,9 @@
 import logging
 import os
+import tempfile
 from pathlib import Path
-from file_converter import FileConverter
+from unittest import mock
+from file_converter import FileConverter, _is_simple_pdf, _iter_paragraph_texts
 
 # Configure logging
 logging.basicConfig(
@@ -39,6 +41,140 @@ def create_sample_pdf():
     logger.info(f"Created sample PDF at: {file_path}")
     return file_path
 
+def create_formatted_docx():
+    """Create a Word document with tabs, line breaks, a table and a text box"""
+    from docx import Document
+    from docx.enum.text import WD_BREAK
+    from docx.oxml import parse_xml
+
+    doc = Document()
+    run = doc.add_paragraph().add_run('Name:')
+    run.add_tab()
+    run.add_text('Alice')
+    run = doc.add_paragraph().add_run('line1')
+    run.add_break()
+    run.add_text('line2')
+    run.add_break(WD_BREAK.PAGE)
+    run.add_text('after page break')
+
+    table = doc.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = 'cell A'
+    table.cell(0, 1).text = 'cell B'
+
+    # Word writes text boxes twice: DrawingML in mc:Choice, VML in mc:Fallback
+    textbox = (
+        '<w:txbxContent><w:p><w:r><w:t>boxed</w:t></w:r></w:p></w:txbxContent>'
+    )
+    anchor = doc.add_paragraph('anchor')
+    anchor.runs[0]._r.append(parse_xml(
+        '<mc:AlternateContent'
+        ' xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"'
+        ' xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f'<mc:Choice Requires="wps">{textbox}</mc:Choice>'
+        f'<mc:Fallback>{textbox}</mc:Fallback>'
+        '</mc:AlternateContent>'
+    ))
+
+    file_path = 'temp/test_document.docx'
+    doc.save(file_path)
+    logger.info(f"Created formatted DOCX at: {file_path}")
+    return file_path
+
+def test_paragraph_texts():
+    """Paragraph text keeps tabs and line breaks and reads each paragraph once"""
+    temp_dir = Path('temp')
+    temp_dir.mkdir(exist_ok=True)
+    try:
+        texts = list(_iter_paragraph_texts(create_formatted_docx()))
+        logger.info(f"Extracted paragraph texts: {texts}")
+        assert texts == [
+            'Name:\tAlice',
+            'line1\nline2after page break',
+            'cell A',
+            'cell B',
+            'boxed',
+            'anchor',
+        ]
+    finally:
+        for test_file in temp_dir.glob('test_document.*'):
+            test_file.unlink()
+
+def test_rejects_mismatched_magic_bytes():
+    """Inputs whose leading bytes don't match the expected format are rejected"""
+    converter = FileConverter()
+    with tempfile.TemporaryDirectory() as tmp:
+        not_a_zip = Path(tmp) / 'fake.docx'
+        not_a_zip.write_bytes(b'hello, not a zip archive')
+        legacy_doc = Path(tmp) / 'legacy.doc'
+        legacy_doc.write_bytes(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + b'\0' * 504)
+        late_header = Path(tmp) / 'late.pdf'
+        late_header.write_bytes(b'\0' * 1024 + b'%PDF-1.4')
+
+        for file_path, convert in (
+            (not_a_zip, converter.word_to_pdf_bytes),
+            (legacy_doc, converter.word_to_pdf_bytes),
+            (late_header, converter.pdf_to_word),
+        ):
+            try:
+                convert(str(file_path))
+            except ValueError as e:
+                logger.info(f"Rejected {file_path.name}: {str(e)}")
+            else:
+                raise AssertionError(f"{file_path.name} was not rejected")
+
+        # Legacy .doc files are only readable by the LibreOffice backend
+        with mock.patch.object(FileConverter, '_libreoffice_to_pdf', return_value=b'%PDF-1.4'):
+            assert converter.word_to_pdf_bytes(str(legacy_doc), backend='libreoffice') == b'%PDF-1.4'
+        logger.info("Accepted legacy .doc with the LibreOffice backend")
+
+def test_smart_punctuation_and_latin1():
+    """Smart quotes and dashes become ASCII, Latin-1 survives and other characters are dropped"""
+    import pymupdf
+    from docx import Document
+
+    with tempfile.TemporaryDirectory() as tmp:
+        docx_path = Path(tmp) / 'typography.docx'
+        doc = Document()
+        doc.add_paragraph('\u201cx\u201d \u2014 \u00e9 \u4e2d')
+        doc.save(docx_path)
+
+        pdf_bytes = FileConverter().word_to_pdf_bytes(str(docx_path))
+        with pymupdf.open(stream=pdf_bytes, filetype='pdf') as pdf_doc:
+            text = pdf_doc[0].get_text().strip()
+        logger.info(f"Rendered PDF text: {text!r}")
+        assert text == '"x" - \u00e9'
+
+def test_simple_pdf_detection():
+    """Only single-column, text-only PDFs take the direct text extraction path"""
+    import pymupdf
+    from fpdf import FPDF
+
+    def render(decorate=None):
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font("Helvetica", size=12)
+        pdf.cell(0, 10, text="Plain text on the left.")
+        if decorate:
+            decorate(pdf)
+        return bytes(pdf.output())
+
+    def draw_line(pdf):
+        pdf.line(10, 30, 100, 30)
+
+    def right_column(pdf):
+        pdf.set_xy(pdf.w / 2 + 10, 40)
+        pdf.cell(0, 10, text="Second column.")
+
+    for name, decorate, expected in (
+        ('text only', None, True),
+        ('with a drawing', draw_line, False),
+        ('with a right-hand block', right_column, False),
+    ):
+        with pymupdf.open(stream=render(decorate), filetype='pdf') as pdf_doc:
+            result = _is_simple_pdf(pdf_doc)
+        logger.info(f"Simple PDF check for page {name}: {result}")
+        assert result is expected
+
 def test_conversions():
     """Test both conversion directions"""
     converter = FileConverter()
@@ -85,4 +221,8 @@ def test_conversions():
                 logger.error(f"Failed to cleanup {test_file}: {str(e)}")
 
 if __name__ == "__main__":
+    test_paragraph_texts()
+    test_rejects_mismatched_magic_bytes()
+    test_smart_punctuation_and_latin1()
+    test_simple_pdf_detection()
     test_conversions()
@@ -0,0 +1,88 @@
+import logging
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+from conversion_cache import ConversionCache
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def create_output_file(directory: Path, name: str, data: bytes) -> str:
+    """Create a converted output file for storing in the cache"""
+    file_path = directory / name
+    file_path.write_bytes(data)
+    return str(file_path)
+
+def test_hit_and_miss():
+    """A stored conversion is returned for its digest and extension only"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ConversionCache(os.path.join(tmp, 'cache'), max_bytes=1024)
+
+        assert cache.get('abc', '.pdf') is None
+        cache.put_bytes('abc', '.pdf', b'%PDF-1')
+        assert cache.get('abc', '.pdf') == b'%PDF-1'
+        assert cache.get('abc', '.docx') is None
+        assert cache.get('def', '.pdf') is None
+        logger.info("Hit and miss behave as expected")
+
+def test_put_links_output():
+    """Outputs on the same filesystem are hard-linked into the cache"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ConversionCache(os.path.join(tmp, 'cache'), max_bytes=1024)
+        output_path = create_output_file(Path(tmp), 'out.docx', b'docx')
+
+        cache.put('abc', '.docx', output_path)
+        assert os.path.samefile(output_path, cache.cache_dir / 'abc.docx')
+        assert cache.get('abc', '.docx') == b'docx'
+        logger.info("Output was linked into the cache")
+
+def test_put_copies_when_link_fails():
+    """Outputs are copied when a hard link isn't possible, e.g. across filesystems"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ConversionCache(os.path.join(tmp, 'cache'), max_bytes=1024)
+        output_path = create_output_file(Path(tmp), 'out.docx', b'docx')
+
+        with mock.patch('os.link', side_effect=OSError("cross-device link")):
+            cache.put('abc', '.docx', output_path)
+        assert not os.path.samefile(output_path, cache.cache_dir / 'abc.docx')
+        assert cache.get('abc', '.docx') == b'docx'
+        assert sorted(p.name for p in cache.cache_dir.iterdir()) == ['abc.docx']
+        logger.info("Output was copied into the cache")
+
+def test_evicts_least_recently_used():
+    """Entries are evicted oldest-access first once the cache is over capacity"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ConversionCache(os.path.join(tmp, 'cache'), max_bytes=20)
+
+        cache.put_bytes('a', '.pdf', b'x' * 8)
+        cache.put_bytes('b', '.pdf', b'x' * 8)
+        # Age both entries, then touch 'a' with a hit so 'b' is the oldest
+        for name, mtime in (('a.pdf', 1000), ('b.pdf', 2000)):
+            os.utime(cache.cache_dir / name, (mtime, mtime))
+        assert cache.get('a', '.pdf') is not None
+
+        cache.put_bytes('c', '.pdf', b'x' * 8)
+        assert sorted(p.name for p in cache.cache_dir.iterdir()) == ['a.pdf', 'c.pdf']
+        logger.info("Least recently used entry was evicted")
+
+def test_evicted_entry_is_a_miss():
+    """A lookup after its entry has been evicted reports a miss instead of failing"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ConversionCache(os.path.join(tmp, 'cache'), max_bytes=1024)
+
+        cache.put_bytes('abc', '.pdf', b'%PDF-1')
+        (cache.cache_dir / 'abc.pdf').unlink()
+        assert cache.get('abc', '.pdf') is None
+        logger.info("Evicted entry reported as a miss")
+
+if __name__ == "__main__":
+    test_hit_and_miss()
+    test_put_links_output()
+    test_put_copies_when_link_fails()
+    test_evicts_least_recently_used()
+    test_evicted_entry_is_a_miss()